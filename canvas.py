@@ -5,15 +5,64 @@ Original script by Ben Javicente, modified (essentially rewrote from scratch) by
 
 import argparse
 import dataclasses
+import functools
+import json
 import os
 import re
+import shutil
+import sqlite3
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import formatdate
 
 import colorama
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+try:
+    # Optional: google-re2 scans page HTML in guaranteed linear time
+    import re2 as html_re
+except ImportError:
+    html_re = re
+
+try:
+    # Optional: orjson decodes the (often large) API responses several times faster
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 colorama.init(autoreset=True)
 
+# Maximum number of requests in flight at once (override with CANVAS_CONCURRENCY)
+DEFAULT_CONCURRENCY = 8
+# Download cache kept in the out directory so reruns only fetch what changed
+CACHE_DB_NAME = ".canvas_cache.sqlite"
+# Downloads are streamed to disk 1 MiB at a time
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Every file of a course along with its folder, in one GraphQL request
+_COURSE_FILES_QUERY = """
+query($cid: ID!) {
+  course(id: $cid) {
+    filesConnection { nodes { _id displayName url size updatedAt folder { fullName } } }
+  }
+}
+"""
+
+# Precompiled patterns used on every file, page and link
+_GDRIVE_RE = re.compile(r"https:\/\/drive\.google\.com\/file\/d\/(?P<id>[^\/]*?)\/")
+# Windows invalid filename characters **EXCEPT** slashes
+_INVALID_CHARS_RE = re.compile(r'[<>:"|?*]')
+_FILENAME_RE = re.compile(r"filename=\"(?P<file_name>[^\"]*)\"")
+_FILENAME_UTF8_RE = re.compile(r"filename\*=UTF-8''(?P<file_name>[^\"]*)")
+_FILE_ID_RE = re.compile(r"/files/(\d+)")
+_PAGE_SLUG_RE = re.compile(r"/pages/([^/?]+)")
+# Page links in a single scan: group 1 is an iframe source, group 2 any other href/src
+_LINK_RE = html_re.compile(r'<iframe[^>]+src="([^"]+)"|(?:href|src)="([^"]+)"')
+
 
 def print_c(string, type_, padding, **kwarg):
     """Prints with color"""
@@ -33,6 +82,32 @@ def print_c(string, type_, padding, **kwarg):
         print(" " * (padding * 2) + string, **kwarg)
 
 
+class _ProgressReader:
+    """File-like wrapper around a response stream that prints download progress as it is read."""
+
+    def __init__(self, raw, total_len, file_name):
+        self.raw = raw
+        self.total_len = total_len
+        self.file_name = file_name
+        self.progress = 0
+        self.shown = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        # Count the bytes received over the wire, like Content-Length, rather than the decoded ones
+        self.progress = self.raw.tell()
+
+        # Only update the progress bar once per MiB (and when done); decoded data can keep coming
+        # after the last compressed byte was read, so don't repeat a value that was already shown
+        if data and self.total_len and self.progress != self.shown and (
+            (self.progress >> 20) != (self.shown >> 20) or self.progress == self.total_len
+        ):
+            self.shown = self.progress
+            perc = (self.progress / self.total_len) * 100
+            print_c(" | ".join((f"{perc:3.0f}%", self.file_name)), "new", 2, end="\r")
+        return data
+
+
 def get_external_download_url(url: str) -> str:
     """
     This should return an URL where the file can be downloaded.
@@ -41,14 +116,14 @@ def get_external_download_url(url: str) -> str:
     """
 
     # Try Google Drive
-    exp = re.compile(r"https:\/\/drive\.google\.com\/file\/d\/(?P<id>[^\/]*?)\/")
-    result = exp.search(url)
+    result = _GDRIVE_RE.search(url)
     if result:
         document_id = result.group("id")
         return f"https://docs.google.com/uc?export=download&id={document_id}"
 
     return ""
 
+@functools.lru_cache(maxsize=16384)
 def sanitize_filename(filename, replacement="_"):
     """Sanitizes a filename for Windows while preserving slashes (`/` or `\`).
     
@@ -57,17 +132,15 @@ def sanitize_filename(filename, replacement="_"):
     - Trims trailing dots and spaces (not allowed in Windows)
     """
 
-    # Windows invalid filename characters **EXCEPT** slashes
-    invalid_chars = r'[<>:"|?*]'
-
     # Replace invalid characters with the given replacement (default: `_`)
-    sanitized = re.sub(invalid_chars, replacement, filename)
+    sanitized = _INVALID_CHARS_RE.sub(replacement, filename)
 
     # Trim trailing dots and spaces (not allowed in Windows)
     sanitized = sanitized.rstrip(". ")
 
     return sanitized
 
+@functools.lru_cache(maxsize=4096)
 def sanitize_path(path, replacement="_"):
     """Sanitizes a full directory or file path for Windows while preserving slashes.
     
@@ -75,12 +148,9 @@ def sanitize_path(path, replacement="_"):
     - Replaces `&` with a safer alternative (`replacement`)
     - Trims trailing dots and spaces (not allowed in Windows)
     """
-    # Windows invalid filename characters (excluding slashes)
-    invalid_chars = r'[<>:"|?*]'
-
     # Replace invalid characters in each part of the path
     sanitized_parts = [
-        re.sub(invalid_chars, replacement, part).rstrip(". ") for part in path.split(os.sep)
+        _INVALID_CHARS_RE.sub(replacement, part).rstrip(". ") for part in path.split(os.sep)
     ]
 
     # Reconstruct the sanitized path
@@ -88,14 +158,22 @@ def sanitize_path(path, replacement="_"):
 
 
 
+# Directories already created by this process
+_ensured_dirs = set()
+
+def ensure_dir(path):
+    """Creates a directory (and its parents) unless it was already created by this process."""
+    if path not in _ensured_dirs:
+        os.makedirs(path, exist_ok=True)
+        _ensured_dirs.add(path)
+
+
 def get_file_name_by_header(header) -> str:
     """Tries to get the file name from the header"""
     if not header:
         return ""
-    exp = re.compile(r"filename=\"(?P<file_name>[^\"]*)\"")
-    exp_utf8 = re.compile(r"filename\*=UTF-8''(?P<file_name>[^\"]*)")
-    result = exp.search(header)
-    result_utf8 = exp_utf8.search(header)
+    result = _FILENAME_RE.search(header)
+    result_utf8 = _FILENAME_UTF8_RE.search(header)
     if result_utf8:
         return requests.utils.unquote(result_utf8.group("file_name"))
     if result:
@@ -103,6 +181,22 @@ def get_file_name_by_header(header) -> str:
     return ""
 
 
+def normalize_timestamp(value):
+    """Converts an ISO 8601 timestamp (REST `updated_at` or GraphQL `updatedAt`) to UTC, e.g. 2024-01-01T00:00:00Z.
+
+    Returns None if the value is missing or can't be parsed.
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
 @dataclasses.dataclass
 class CanvasApi:
     """Canvas REST API wrapper"""
@@ -112,6 +206,24 @@ class CanvasApi:
     domain: str
     token: str
 
+    def __post_init__(self):
+        self.concurrency = max(1, int(os.environ.get("CANVAS_CONCURRENCY", DEFAULT_CONCURRENCY)))
+        self._sem = threading.BoundedSemaphore(self.concurrency)
+
+        # One session for every request so connections (and their TLS handshakes) are reused.
+        # Rate limited (429) and transient server errors are retried, honoring Retry-After
+        self._session = requests.Session()
+        self._session.headers.update({"Authorization": f"Bearer {self.token}"})
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        # A streamed download keeps its connection after releasing its slot, so API calls can have as many
+        # again in flight: size the per-host pool for both to avoid discarding connections
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=2 * self.concurrency, max_retries=retries)
+        self._session.mount("https://", adapter)
+
+        # Files and folders looked up by ID, keyed by (course_id, id)
+        self._file_cache = {}
+        self._folder_cache = {}
+
     def __url(self, query):
         return "/".join(("https:/", self.domain, "api/v1", query))
 
@@ -123,13 +235,19 @@ class CanvasApi:
         # Ensure 'per_page' is set to 500
         params["per_page"] = 500  
 
-        response = requests.get(
-            url=self.__url(query),
-            headers={"Authorization": f"Bearer {self.token}"},
+        response = self._request(
+            "GET",
+            self.__url(query),
             params=params,  # Correctly merged parameters
             **kwarg,
         )
-        return response.json()
+        return json_loads(response.content)
+
+
+    def _request(self, method: str, url: str, **kwarg):
+        """Sends a request through the shared session while holding one of the concurrency slots."""
+        with self._sem:
+            return self._session.request(method, url, **kwarg)
 
 
 
@@ -163,22 +281,80 @@ class CanvasApi:
 
 
     def get_file_from_id(self, course_id: int, file_id: int) -> dict:
-        """Gets a file of a specific course using its ID."""
-        return self.__get(f"courses/{course_id}/files/{file_id}")
+        """Gets a file of a specific course using its ID (cached for the run)."""
+        key = (course_id, str(file_id))
+        if key not in self._file_cache:
+            file_obj = self.__get(f"courses/{course_id}/files/{file_id}")
+            if "errors" in file_obj:
+                return file_obj  # Don't cache failures so they can be retried
+            self._file_cache[key] = file_obj
+        return self._file_cache[key]
 
 
     def get_folder_from_id(self, course_id: int, folder_id: int) -> dict:
-        """Gets a folder from a specific course using its ID."""
-        return self.__get(f"courses/{course_id}/folders/{folder_id}")
+        """Gets a folder from a specific course using its ID (cached for the run, as many files share a folder)."""
+        key = (course_id, folder_id)
+        if key not in self._folder_cache:
+            folder_obj = self.__get(f"courses/{course_id}/folders/{folder_id}")
+            if "errors" in folder_obj:
+                return folder_obj  # Don't cache failures so they can be retried
+            self._folder_cache[key] = folder_obj
+        return self._folder_cache[key]
+
+
+    def _graphql(self, query: str, variables: dict) -> dict:
+        """Performs a query against the Canvas GraphQL API."""
+        response = self._request("POST", f"https://{self.domain}/api/graphql", json={"query": query, "variables": variables})
+        return json_loads(response.content)
+
+
+    def get_course_files(self, course_id: int) -> dict:
+        """Gets all files of a course with their folders using a single GraphQL request.
+
+        Returns {file_id: (file, folder)} shaped like the REST objects, or {} if GraphQL is unavailable.
+        """
+        try:
+            nodes = self._graphql(_COURSE_FILES_QUERY, {"cid": course_id})["data"]["course"]["filesConnection"]["nodes"]
+        except (KeyError, TypeError, ValueError):
+            return {}
+
+        files = {}
+        for node in nodes:
+            # Locked or inaccessible files have no URL; leave them out so they go through the REST lookup
+            if not node.get("url"):
+                continue
+
+            file_obj = {"url": node["url"], "display_name": node["displayName"], "updated_at": node.get("updatedAt")}
+            # GraphQL may report the size as a human-readable string ("1.2 MB"); only a byte count can
+            # replace the HEAD request, so leave anything else out
+            if isinstance(node.get("size"), int):
+                file_obj["size"] = node["size"]
+            folder_obj = {"full_name": node["folder"]["fullName"]} if node.get("folder") else {}
+            files[int(node["_id"])] = (file_obj, folder_obj)
+        return files
+
+
+    def _get_file_and_folder(self, course_id: int, file_id: int) -> tuple:
+        """Gets a file of a course along with the folder containing it ({} if unavailable)."""
+        file_obj = self.get_file_from_id(course_id, file_id)
+        if not isinstance(file_obj, dict) or "folder_id" not in file_obj:
+            return file_obj, {}
+        return file_obj, self.get_folder_from_id(course_id, file_obj["folder_id"])
+
+
+    def _gather(self, fn, *iterables) -> list:
+        """Calls `fn` over the given arguments concurrently and returns the results in order."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(fn, *iterables))
 
 
     def _download_from_pages(self, course_id, course_name):
         """Loops through all available pages and downloads their content if pages are enabled."""
         
         pages_api_url = f"https://{self.domain}/api/v1/courses/{course_id}/pages"
-        response = requests.get(
-            pages_api_url, 
-            headers={"Authorization": f"Bearer {self.token}"},
+        response = self._request(
+            "GET",
+            pages_api_url,
             params={"per_page": 250}  # Ensuring 250 pages per request
         )
 
@@ -186,20 +362,22 @@ class CanvasApi:
             print_c(f"Warning: Pages are not enabled for course {course_name}. Skipping.", "error", 1)
             return False
 
-        pages_list = response.json()
+        pages_list = json_loads(response.content)
         if not pages_list:
             print_c(f"Warning: No pages found for course {course_name}.", "error", 1)
             return False
 
         print_c(f"Found {len(pages_list)} pages in {course_name}. Downloading all page-linked files...", "new", 1)
-        
+
+        page_urls = []
         for page in pages_list:
             if "url" not in page:
                 print_c(f"Warning: Skipping a page in {course_name} due to missing 'url' key.", "error", 2)
                 continue
-            
-            self._download_canvas_page(course_id, f"https://{self.domain}/courses/{course_id}/pages/{page['url']}", course_name)
 
+            page_urls.append(f"https://{self.domain}/courses/{course_id}/pages/{page['url']}")
+
+        self._crawl_pages(course_id, page_urls, course_name)
         return True
 
 
@@ -211,6 +389,38 @@ class CanvasDownloader(CanvasApi):
 
     out_dir: str
 
+    def __post_init__(self):
+        super().__post_init__()
+        self.download_cache = {}
+        self._cache_lock = threading.Lock()
+        self._pool = None
+        self._iframe_files = {}
+        self._iframe_count = 0
+
+        # Persistent cache of downloaded files, shared by the worker threads (guarded by _db_lock).
+        # Opened by download_files once the user confirms, so nothing is written before that;
+        # without it (e.g. when the download methods are called directly) downloads just aren't recorded
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._cached_files = {}
+
+    def _open_cache(self):
+        """Opens (creating it if needed) the download cache in the out directory and loads it into memory."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.out_dir, CACHE_DB_NAME), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files (url TEXT PRIMARY KEY, etag TEXT, size INTEGER, path TEXT, mtime REAL, updated_at TEXT)"
+        )
+        # Caches written before updated_at was tracked lack the column
+        if "updated_at" not in {column["name"] for column in self._db.execute("PRAGMA table_info(files)")}:
+            self._db.execute("ALTER TABLE files ADD COLUMN updated_at TEXT")
+
+        # Load it whole, so per-file lookups are served from memory instead of a query each
+        self._cached_files = {
+            row["url"]: dict(row) for row in self._db.execute("SELECT url, etag, size, path, mtime, updated_at FROM files")
+        }
+
     def download_files(self, all_courses=False, use="all"):
         """Downloads files from Canvas, including modules, folders, and pages."""
         print_c(f"Getting {'all courses' if use == 'all' else 'only favorited courses (pass -all flag to get all)'}...", "existing", 0)
@@ -231,6 +441,8 @@ class CanvasDownloader(CanvasApi):
             print_c("course error: " + courses["errors"][0]["message"], "error", 0)
             return False
 
+        self._open_cache()
+
         for course in courses:
             if not course.get("course_code"):
                 print(f"Course missing valid code, skipping for ID: {course.get('id')}")
@@ -239,25 +451,27 @@ class CanvasDownloader(CanvasApi):
             print_c(course["course_code"], type_="group", padding=0)
             course_code, course_id = course["id"], course["course_code"]
 
-            # Reset cache for each course
-            self.download_cache = {}
-
             methods = [self._download_from_modules, self._download_from_folders, self._download_from_pages]
 
-            if use == "all":
+            if use == "pages":
+                methods = methods[2:3]
+            elif use == "folders":
+                methods = methods[1:2]
+            elif use != "all":
+                methods = methods[0:1]
+
+            # With a single slot, download inline so the progress bar has the terminal to itself
+            if self.concurrency == 1:
                 for method in methods:
                     method(course_code, course_id)
                 continue
 
-            if use == "pages":
-                method = methods[2]
-            elif use == "folders":
-                method = methods[1]
-            else:
-                method = methods[0]
-
-            # Use selected method to download course content
-            method(course_code, course_id)
+            # Otherwise walk the course on this thread and hand file downloads to the pool;
+            # leaving the block waits for every queued download to finish
+            with ThreadPoolExecutor(max_workers=self.concurrency) as self._pool:
+                for method in methods:
+                    method(course_code, course_id)
+            self._pool = None
 
         print("Finished downloading all available courses. Have a great day >:)")
         return True
@@ -283,8 +497,9 @@ class CanvasDownloader(CanvasApi):
                     print_c("Error in _download_from_folders: invalid item, skipping", "error", 2)
                     continue  # Skip invalid objects
 
-                self._download_file(
-                    file_obj["url"], folder_path, file_obj["display_name"]
+                self._queue_download(
+                    file_obj["url"], folder_path, file_obj["display_name"],
+                    expected_size=file_obj.get("size"), updated_at=file_obj.get("updated_at"),
                 )
 
         return True
@@ -296,11 +511,26 @@ class CanvasDownloader(CanvasApi):
             print_c(f"Warning: Modules are not available for course {course_name}. Skipping.", "error", 1)
             return False
 
-        for module in modules_list:
-            if not module.get("items_count"):
-                continue
+        modules_list = [module for module in modules_list if module.get("items_count")]
 
-            module_items = self.get_modules_items(course_id, module["id"])
+        # Fetch the items of every module concurrently
+        items_lists = self._gather(lambda module: self.get_modules_items(course_id, module["id"]), modules_list)
+
+        # Then resolve every file item (file metadata and its folder)
+        file_ids = {
+            item["content_id"]
+            for module_items in items_lists if "errors" not in module_items
+            for item in module_items if isinstance(item, dict) and item.get("type") == "File"
+        }
+        # with one GraphQL request for the whole course, falling back to concurrent REST lookups for any it did not return
+        file_folder_pairs = self.get_course_files(course_id) if file_ids else {}
+        missing_ids = [file_id for file_id in file_ids if file_id not in file_folder_pairs]
+        file_folder_pairs.update(zip(missing_ids, self._gather(lambda file_id: self._get_file_and_folder(course_id, file_id), missing_ids)))
+
+        # Pages (and Canvas links) in the modules are crawled together once all files are queued
+        page_urls = []
+
+        for module, module_items in zip(modules_list, items_lists):
             if "errors" in module_items:
                 print_c(f"Warning: Unable to retrieve module items for {module['name']} in course {course_name}.", "error", 2)
                 continue
@@ -314,131 +544,180 @@ class CanvasDownloader(CanvasApi):
                     continue  # Skip invalid objects
 
                 if item["type"] == "File":
-                    file_obj = self.get_file_from_id(course_id, item["content_id"])
-                    folder_obj = self.get_folder_from_id(course_id, file_obj["folder_id"])
+                    file_obj, folder_obj = file_folder_pairs[item["content_id"]]
                     current_folder_path = ([course_name] + folder_obj["full_name"].split("/")[1:]) if "full_name" in folder_obj else module_path
                     if not isinstance(file_obj, dict) or "url" not in file_obj:
                         print_c("Error in module item file downloader: invalid item, skipping", "error", 2)
                         continue  # Skip invalid objects
-                    self._download_file(file_obj["url"], current_folder_path, file_obj["display_name"])
+                    self._queue_download(
+                        file_obj["url"], current_folder_path, file_obj["display_name"],
+                        expected_size=file_obj.get("size"), updated_at=file_obj.get("updated_at"),
+                    )
 
                 elif item["type"] == "ExternalUrl":
                     if self._is_canvas_url(item["external_url"]):
-                        self._download_canvas_page(course_id, item["external_url"], course_name)
+                        page_urls.append(item["external_url"])
 
                 elif item["type"] == "Page":
-                    self._download_canvas_page(course_id, f"https://{self.domain}/courses/{course_id}/pages/{item['page_url']}", course_name)
+                    page_urls.append(f"https://{self.domain}/courses/{course_id}/pages/{item['page_url']}")
 
+        self._crawl_pages(course_id, page_urls, course_name)
         return True
 
 
-    def _download_canvas_page(self, course_id, page_url, course_name):
-        """Fetches a Canvas page, saves it as an HTML file, and downloads embedded iframes for offline viewing."""
+    def _crawl_pages(self, course_id, page_urls, course_name):
+        """Downloads Canvas pages breadth-first, following the links between them.
+
+        Each level of the crawl is downloaded concurrently, and pages already visited in this run are skipped.
+        """
+        frontier = self._unvisited_pages(page_urls)
+        while frontier:
+            found_links = self._gather(lambda page_url: self._download_canvas_page(course_id, page_url, course_name), frontier)
+            frontier = self._unvisited_pages(link for links in found_links for link in links)
+
+
+    def _unvisited_pages(self, page_urls) -> list:
+        """Marks the given pages as visited, returning the (normalized) URLs of the ones that were not already."""
+        new_page_urls = []
+        for page_url in page_urls:
+            normalized_page_url = self._normalize_url(page_url)
+            with self._cache_lock:
+                if normalized_page_url in self.download_cache:
+                    continue
+                self.download_cache[normalized_page_url] = True  # Mark this page as visited
+            new_page_urls.append(normalized_page_url)
+        return new_page_urls
+
+
+    def _download_canvas_page(self, course_id, page_url, course_name) -> list:
+        """Fetches a Canvas page, saves it as an HTML file, and downloads embedded iframes for offline viewing.
+
+        `page_url` is expected to be normalized already (the crawler does it once per URL).
+        Returns the links to other Canvas pages found on it, for the crawler to follow.
+        """
 
         if isinstance(course_name, list):
             course_name = course_name[0]  # Ensure course_name is a string
 
         if not page_url or not isinstance(page_url, str) or not page_url.startswith(("http://", "https://")):
             print_c("Error in _download_canvas_page: Invalid URL", "error", 2)
-            return
+            return []
 
         # Define the "Files" folder for the course
         files_folder = sanitize_path(os.path.join(self.out_dir, course_name, "Files"))
-        os.makedirs(files_folder, exist_ok=True)
+        ensure_dir(files_folder)
 
-        # Normalize page URL and check cache
-        normalized_page_url = self._normalize_url(page_url)
-        # if page_url in self.download_cache:
-        #     print_c(f"Skipping cached page: {page_url}", "existing", 2)
-        #     return
-
-        match = re.search(r"/pages/([^/?]+)", normalized_page_url)
+        match = _PAGE_SLUG_RE.search(page_url)
         if not match:
-            print_c(f"Skipping non-Canvas page: {normalized_page_url}", "error", 2)
-            return
+            print_c(f"Skipping non-Canvas page: {page_url}", "error", 2)
+            return []
 
         page_slug = match.group(1)
         api_url = f"https://{self.domain}/api/v1/courses/{course_id}/pages/{page_slug}"
 
         try:
-            response = requests.get(api_url, headers={"Authorization": f"Bearer {self.token}"})
+            response = self._request("GET", api_url)
             
             if response.status_code != 200:
                 print_c(f"Failed to fetch page: {page_url}", "error", 2)
-                return
+                return []
 
-            page_data = response.json()
+            page_data = json_loads(response.content)
             page_title = page_data.get("title", "Untitled Page").strip().replace("/", "-")  # Sanitize filename
             page_html = page_data.get("body", "")
 
             if not page_html:
                 print_c(f"Warning: Page {page_slug} has no content. Skipping.", "error", 2)
-                return
+                return []
 
-            # Find all iframe sources and download them
-            iframe_links = re.findall(r'<iframe[^>]+src="([^"]+)"', page_html)
-            iframe_replacements = {}
+            # Collect iframe sources and all other links in one pass over the page
+            iframe_links, links = [], []
+            for iframe_src, link in _LINK_RE.findall(page_html):
+                if iframe_src:
+                    iframe_links.append(iframe_src)
+                links.append(iframe_src or link)
 
-            for iframe_src in iframe_links:
-                clean_iframe_src_normalized = self._normalize_url(iframe_src)
+            # Download all new iframes concurrently, reusing the local copies of ones seen on other pages of the course
+            iframe_replacements = {}
+            new_iframes = {}
+            for iframe_src in dict.fromkeys(iframe_links):
+                # Claim the iframe under the lock so pages crawled concurrently fetch it only once
+                with self._cache_lock:
+                    if (files_folder, iframe_src) in self._iframe_files:
+                        iframe_replacements[iframe_src] = self._iframe_files[files_folder, iframe_src]
+                        continue
 
-                if clean_iframe_src_normalized in self.download_cache:
-                    local_iframe_file = self.download_cache[clean_iframe_src_normalized]  # Use cached file name
-                else:
                     # Generate a unique local filename for the iframe
-                    iframe_file_name = f"iframe_{len(self.download_cache) + 1}.html"
-                    local_iframe_file = os.path.join(files_folder, iframe_file_name)
-
-                    # Download iframe content
-                    iframe_response = requests.get(iframe_src, headers={"Authorization": f"Bearer {self.token}"}, allow_redirects=True)
-                    if iframe_response.status_code == 200:
-                        with open(sanitize_filename(local_iframe_file), "w", encoding="utf-8") as iframe_file:
-                            iframe_file.write(iframe_response.text)
-
-                        print_c(f"Downloaded iframe: {iframe_file_name}", "new", 2)
-                        self.download_cache[iframe_src] = iframe_file_name  # Cache iframe file mapping
-                    else:
-                        print_c(f"Failed to fetch iframe: {iframe_src}", "error", 2)
-                        continue  # Skip this iframe if download fails
+                    self._iframe_count += 1
+                    new_iframes[iframe_src] = f"iframe_{self._iframe_count}.html"
+                    self._iframe_files[files_folder, iframe_src] = new_iframes[iframe_src]
 
+            local_iframe_files = [os.path.join(files_folder, name) for name in new_iframes.values()]
+            downloaded = self._gather(self._download_iframe, new_iframes, local_iframe_files)
+            for (iframe_src, iframe_file_name), ok in zip(new_iframes.items(), downloaded):
                 # Ensure iframe replacement is only performed if a valid file exists
-                if local_iframe_file:
-                    iframe_replacements[iframe_src] = os.path.basename(local_iframe_file)
+                if ok:
+                    iframe_replacements[iframe_src] = iframe_file_name
+                else:
+                    with self._cache_lock:
+                        self._iframe_files.pop((files_folder, iframe_src), None)  # Release the claim so it can be retried
 
-            # Replace iframe `src` with local references
-            for original_src, local_file in iframe_replacements.items():
-                page_html = page_html.replace(f'src="{original_src}"', f'src="{local_file}"')
+            # Replace iframe `src` with local references in a single pass over the page
+            if iframe_replacements:
+                src_re = re.compile('src="(' + "|".join(map(re.escape, iframe_replacements)) + ')"')
+                page_html = src_re.sub(lambda m: f'src="{iframe_replacements[m.group(1)]}"', page_html)
 
-            # Save the updated Canvas page as an HTML file
+            # Save the updated Canvas page as an HTML file on the worker pool, so this thread keeps crawling
             html_file_path = os.path.join(files_folder, f"{page_title}.html")
+            self._submit(self._save_page, html_file_path, page_title, page_html)
+
+            # Look up all Canvas files linked from the page concurrently and queue their downloads
+            # (iframes now pointing to local copies excluded)
+            links = [link for link in links if link not in iframe_replacements and self._is_canvas_url(link)]
+            file_ids = dict.fromkeys(self._extract_canvas_file_id(link) for link in links if "/files/" in link)
+            file_ids.pop(None, None)
+            for file_obj in self._gather(lambda file_id: self.get_file_from_id(course_id, file_id), file_ids):
+                if not isinstance(file_obj, dict) or "url" not in file_obj:
+                    print_c("Error in _download_canvas_page: invalid item, skipping", "error", 2)
+                    continue  # Skip invalid objects
+                self._queue_download(
+                    file_obj["url"], [course_name, "Files"], file_obj["display_name"],
+                    expected_size=file_obj.get("size"), updated_at=file_obj.get("updated_at"),
+                )
 
-            with open(sanitize_filename(html_file_path), "w", encoding="utf-8") as html_file:
-                html_file.write(f"<html><head><title>{page_title}</title></head><body>{page_html}</body></html>")
-
-            print_c(f"Saved Canvas page: {html_file_path}", "new", 2)
-
-            # Extract and download all file links from the page
-            links = re.findall(r'href="([^"]+)"', page_html) + re.findall(r'src="([^"]+)"', page_html)
-
-            for link in links:
-                if self._is_canvas_url(link):
-                    if "/files/" in link:
-                        file_id = self._extract_canvas_file_id(link)
-                        if file_id:
-                            file_obj = self.get_file_from_id(course_id, file_id)
-                            if not isinstance(file_obj, dict) or "url" not in file_obj:
-                                print_c("Error in _download_canvas_page: invalid item, skipping", "error", 2)
-                                continue  # Skip invalid objects
-                            self._download_file(file_obj["url"], [course_name, "Files"], file_obj["display_name"])
-                    elif "/pages/" in link:
-                        if link not in self.download_cache:
-                            self.download_cache[link] = True  # Mark this page as visited
-                            self._download_canvas_page(course_id, link, course_name)  # Recursively follow linked pages
+            # Linked pages are returned to the crawler instead of being followed recursively
+            return [link for link in links if "/pages/" in link and "/files/" not in link]
         except Exception as e:
             print_c(f"Error in download_canvas_page. Exception type: {type(e).__name__}", "error", 2)
             print(f"Exception message: {str(e)}", "error", 2)
             print("Traceback details:", "error", 2)
             traceback.print_exc()
+            return []
+
+
+    def _save_page(self, html_file_path, page_title, page_html):
+        """Writes a Canvas page to a standalone HTML file."""
+        try:
+            with open(sanitize_filename(html_file_path), "w", encoding="utf-8") as html_file:
+                html_file.write(f"<html><head><title>{page_title}</title></head><body>{page_html}</body></html>")
+
+            print_c(f"Saved Canvas page: {html_file_path}", "new", 2)
+        except OSError as e:
+            print_c(f"Error saving Canvas page {html_file_path}: {e}", "error", 2)
+
+
+    def _download_iframe(self, iframe_src, local_iframe_file) -> bool:
+        """Saves the content of an iframe to a local HTML file, returning whether it succeeded."""
+        iframe_response = self._request("GET", iframe_src, allow_redirects=True)
+        if iframe_response.status_code != 200:
+            print_c(f"Failed to fetch iframe: {iframe_src}", "error", 2)
+            return False
+
+        with open(sanitize_filename(local_iframe_file), "w", encoding="utf-8") as iframe_file:
+            iframe_file.write(iframe_response.text)
+
+        print_c(f"Downloaded iframe: {os.path.basename(local_iframe_file)}", "new", 2)
+        return True
 
 
     def _is_canvas_url(self, url):
@@ -448,34 +727,109 @@ class CanvasDownloader(CanvasApi):
 
     def _extract_canvas_file_id(self, file_url):
         """Extracts the file ID from a Canvas file URL."""
-        match = re.search(r"/files/(\d+)", file_url)
+        match = _FILE_ID_RE.search(file_url)
         return match.group(1) if match else None
 
 
 
     def _normalize_url(self, url):
         """Removes query parameters from Canvas file URLs."""
-        return re.sub(r"\?.*", "", url)
+        return url.partition("?")[0]
 
 
-    def _download_file(self, file_url, folder_path, name="", downloadBodyOnly=False):
+    def _local_size(self, path):
+        """Returns the size of a local file, or None if it doesn't exist (a single stat call)."""
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
+
+
+    def _cache_lookup(self, normalized_url):
+        """Returns the cached row (etag, size, path, mtime, updated_at) of a previously downloaded file, or None."""
+        row = self._cached_files.get(normalized_url)
+        if row is None:
+            return None
+        # Paths are stored relative to the out directory, so the cache works from any working directory
+        return {**row, "path": os.path.join(self.out_dir, row["path"])}
+
+
+    def _cache_store(self, normalized_url, path, etag=None, updated_at=None):
+        """Records a downloaded file (and the Canvas `updated_at` it was downloaded at) in the persistent cache."""
+        if self._db is None:
+            return
+
+        row = {
+            "etag": etag,
+            "size": os.path.getsize(path),
+            "path": os.path.relpath(path, self.out_dir),
+            "mtime": os.path.getmtime(path),
+            "updated_at": updated_at,
+        }
+        with self._db_lock:
+            self._cached_files[normalized_url] = row
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (url, etag, size, path, mtime, updated_at) "
+                "VALUES (:url, :etag, :size, :path, :mtime, :updated_at)",
+                {"url": normalized_url, **row},
+            )
+            self._db.commit()
+
+
+    def _submit(self, fn, *args, **kwarg):
+        """Schedules work on the course's worker pool (or runs it inline if there is none)."""
+        if self._pool is None:
+            fn(*args, **kwarg)
+            return
+        self._pool.submit(fn, *args, **kwarg).add_done_callback(self._report_failure)
+
+
+    @staticmethod
+    def _report_failure(future):
+        """Prints the exception of a failed pool task, which would otherwise be silently dropped."""
+        if future.cancelled() or future.exception() is None:
+            return
+        exc = future.exception()
+        print_c(f"Error in worker. Exception type: {type(exc).__name__}", "error", 2)
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+    def _release_download(self, normalized_url):
+        """Unmarks a failed download so another link to the same file can retry it."""
+        with self._cache_lock:
+            self.download_cache.pop(normalized_url, None)
+
+
+    def _queue_download(self, *args, **kwarg):
+        """Schedules a file download on the course's worker pool."""
+        self._submit(self._download_file, *args, **kwarg)
+
+
+    def _download_file(self, file_url, folder_path, name="", downloadBodyOnly=False, expected_size=None, updated_at=None):
         """Downloads a file while caching metadata to avoid repeated checks.
 
         - If downloadBodyOnly=True, saves only the HTML content (used for pages).
         - Otherwise, downloads the full binary file (used for PDFs, PPTXs, etc.).
+        - If both `name` and `expected_size` (from the Canvas file object) are given, no HEAD request is made.
+        - A file downloaded by a previous run is skipped without any request if its Canvas `updated_at` is
+          unchanged, and otherwise revalidated with a conditional GET.
         """
 
         # Normalize the URL for caching (removes verification tokens)
         normalized_file_url = self._normalize_url(file_url)
+        # REST and GraphQL format timestamps differently, so compare (and store) them in UTC
+        updated_at = normalize_timestamp(updated_at)
 
         # Ensure directory exists
         dir_path = sanitize_path(os.path.join(self.out_dir, *folder_path))
-        os.makedirs(dir_path, exist_ok=True)
+        ensure_dir(dir_path)
 
-        # If file was already downloaded in this course, skip it
-        if normalized_file_url in self.download_cache:
-            print_c(f"Skipping {name or 'Unknown'} (Already downloaded & cached).", "existing", 2)
-            return
+        # If file was already downloaded (or is being downloaded by another worker) in this run, skip it
+        with self._cache_lock:
+            if normalized_file_url in self.download_cache:
+                print_c(f"Skipping {name or 'Unknown'} (Already downloaded & cached).", "existing", 2)
+                return
+            self.download_cache[normalized_file_url] = True
 
         # Determine the file name
         file_name = name
@@ -484,51 +838,90 @@ class CanvasDownloader(CanvasApi):
         # Ensure file url is valid
         if not file_url or not isinstance(file_url, str) or not file_url.startswith(("http://", "https://")):
             print_c(f"Error: URL of file is invalid (URL={file_url}). Skipping.", "error", 2)
+            self._release_download(normalized_file_url)
             return
 
-        # If name is not provided, try fetching it from headers
+        # If a previous run downloaded it and the local copy is intact, check whether it changed since
+        cached = self._cache_lookup(normalized_file_url)
+        conditional_headers = {}
+        if cached and self._local_size(cached["path"]) == cached["size"]:
+            if updated_at is not None and updated_at == cached["updated_at"]:
+                print_c(f"Skipping {os.path.basename(cached['path'])} (Already downloaded in a previous run).", "existing", 2)
+                return
+
+            # Canvas reports a change (or no timestamp), so let the server answer 304 if the content is unchanged
+            if cached["etag"]:
+                conditional_headers["If-None-Match"] = cached["etag"]
+            conditional_headers["If-Modified-Since"] = formatdate(cached["mtime"], usegmt=True)
+
         try:
-            if not file_name:
-                response_head = requests.head(file_url, headers={"Authorization": f"Bearer {self.token}"}, allow_redirects=True)
-                if response_head.status_code != 200:
-                    print_c(f"Error: Could not fetch metadata for {file_url}. Skipping.", "error", 2)
+            download_response = None
+            if conditional_headers:
+                # Revalidate the previous download (the body of a 200 is reused below)
+                response_head = download_response = self._request(
+                    "GET", file_url, headers=conditional_headers, allow_redirects=True, stream=not downloadBodyOnly
+                )
+                if response_head.status_code == 304:
+                    print_c(f"Skipping {os.path.basename(cached['path'])} (Unchanged since the previous run).", "existing", 2)
+                    response_head.close()
+                    # Remember the new timestamp so the next run skips it without a request
+                    self._cache_store(normalized_file_url, cached["path"], response_head.headers.get("ETag", cached["etag"]), updated_at)
                     return
-
-                content_header = response_head.headers.get("Content-Disposition")
-                file_name = get_file_name_by_header(content_header) if content_header else "unknown_file"
-                file_path = os.path.join(dir_path, file_name)
+            elif file_name and expected_size is not None:
+                # Canvas metadata already provided the name and size, so skip the HEAD round-trip
+                response_head = None
+                file_size = expected_size
             else:
-                # Fetch file metadata (size) only if needed
-                response_head = requests.head(file_url, headers={"Authorization": f"Bearer {self.token}"}, allow_redirects=True)
+                # Otherwise fetch the missing name (from headers) and size with a HEAD request
+                response_head = self._request("HEAD", file_url, allow_redirects=True)
+
+            if response_head is not None:
                 if response_head.status_code != 200:
-                    print_c(f"Error: Could not fetch metadata for {file_name}. Skipping.", "error", 2)
+                    print_c(f"Error: Could not fetch metadata for {file_name or file_url}. Skipping.", "error", 2)
+                    response_head.close()  # Return the (possibly streamed) connection to the pool
+                    self._release_download(normalized_file_url)
                     return
 
-            file_size = int(response_head.headers.get("Content-Length", 0))
+                if not file_name:
+                    content_header = response_head.headers.get("Content-Disposition")
+                    file_name = get_file_name_by_header(content_header) if content_header else "unknown_file"
+                    file_path = os.path.join(dir_path, file_name)
 
-            # Check if file exists and compare sizes
-            if os.path.exists(file_path):
-                existing_size = os.path.getsize(file_path)
+                file_size = int(response_head.headers.get("Content-Length", 0))
 
-                if existing_size == file_size:
+            # Check if file exists and compare sizes (a single stat call)
+            existing_size = self._local_size(file_path)
+            if existing_size is not None:
+                # (A 200 to the conditional GET means the file changed, even if the size did not)
+                if existing_size == file_size and not conditional_headers:
                     print_c(f"Skipping {file_name} (Already downloaded & sizes match).", "existing", 2)
-                    self.download_cache[file_url] = True  # Mark as cached
+                    self._cache_store(normalized_file_url, file_path, updated_at=updated_at)
+                    if download_response is not None:
+                        download_response.close()
                     return  # Skip downloading
 
-                # If size mismatch, rename the new file
+                # If size mismatch, rename the new file (picking a free suffix from one directory listing)
+                existing_names = {entry.name for entry in os.scandir(dir_path)}
                 base_name, ext = os.path.splitext(file_name)
                 count = 1
                 new_file_name = f"{base_name}_{count}{ext}"
-                while os.path.exists(os.path.join(dir_path, new_file_name)):
+                while new_file_name in existing_names:
                     count += 1
                     new_file_name = f"{base_name}_{count}{ext}"
 
-                print_c(f"File size mismatch for {file_name}. Saving as {new_file_name}.", "error", 2)
+                reason = "Remote change" if conditional_headers else "File size mismatch"
+                print_c(f"{reason} for {file_name}. Saving as {new_file_name}.", "error", 2)
                 file_name = new_file_name  # Use the new name
                 file_path = os.path.join(dir_path, file_name)
 
             # Start the actual file download (only if needed)
-            download_response = requests.get(file_url, headers={"Authorization": f"Bearer {self.token}"}, allow_redirects=True, stream=not downloadBodyOnly)
+            if download_response is None:
+                download_response = self._request("GET", file_url, allow_redirects=True, stream=not downloadBodyOnly)
+            if download_response.status_code != 200:
+                print_c(f"Error: Could not download {file_name} (HTTP {download_response.status_code}). Skipping.", "error", 2)
+                download_response.close()
+                self._release_download(normalized_file_url)
+                return
 
             # Ensure content length for progress bar
             content_len = download_response.headers.get("Content-Length")
@@ -542,29 +935,39 @@ class CanvasDownloader(CanvasApi):
 
                 print_c(f"Saved HTML content: {file_name}", "new", 2)
             else:
-                # Download with progress bar for binary files
-                print_c(" | ".join((f"{0:3.0f}%", file_name)), "new", 2, end="\r")
-
+                # Several workers share the terminal when running on the pool, so a `\r` progress bar would
+                # be overwritten by their output; only show it for inline downloads (CANVAS_CONCURRENCY=1)
+                # and report the rest when done
+                show_progress = self._pool is None
+                if show_progress:
+                    print_c(" | ".join((f"{0:3.0f}%", file_name)), "new", 2, end="\r")
+
+                # Copy the raw stream straight to disk (decoding any Content-Encoding) instead of iterating in Python.
+                # os.sendfile can't be used here: Linux only accepts a regular file as its source, the socket
+                # carries TLS ciphertext, and http.client may already have buffered part of the body
+                download_response.raw.decode_content = True
+                reader = _ProgressReader(download_response.raw, total_len, file_name) if show_progress else download_response.raw
                 with open(sanitize_filename(file_path), "wb") as file:
-                    progress = 0
+                    shutil.copyfileobj(reader, file, length=DOWNLOAD_CHUNK_SIZE)
 
-                    for data in download_response.iter_content(chunk_size=4096):
-                        file.write(data)
-                        progress += len(data)
+                if show_progress:
+                    print(end="\n")
 
-                        if total_len:
-                            perc = (progress / total_len) * 100
-                            print_c(" | ".join((f"{perc:3.0f}%", file_name)), "new", 2, end="\r")
-
-                print(end="\n")
-
-            # Mark file as downloaded in this course
-            self.download_cache[file_url] = True
+                # Compare the bytes received over the wire (before decoding) with Content-Length
+                received = download_response.raw.tell()
+                if total_len and received != total_len:
+                    print_c(f"Warning: {file_name} is incomplete ({received} of {total_len} bytes).", "error", 2)
+                    self._release_download(normalized_file_url)
+                else:
+                    self._cache_store(normalized_file_url, sanitize_filename(file_path), download_response.headers.get("ETag"), updated_at)
+                    if not show_progress:
+                        print_c(f"Downloaded {file_name}", "new", 2)
         except Exception as e:
             print_c(f"Error in file_download. Exception type: {type(e).__name__}", "error", 2)
             print(f"Exception message: {str(e)}", "error", 2)
             print("Traceback details:", "error", 2)
             traceback.print_exc()
+            self._release_download(normalized_file_url)
 
 
 